@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# Generate CloudFormation templates for ACME in a single run. Templates don't
+# depend on each other, so they are built in parallel worker processes.
+
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from importlib import import_module
+from os.path import splitext
+
+# Template generator modules.
+generators = ["vpc", "security-groups", "db", "api-asg", "load-balancers"]
+
+
+def generate(name, path):
+    # Build and write the template of a single generator module.
+    import_module(name).main(path)
+
+
+def main():
+    parser = ArgumentParser(
+        description="Generate ACME CloudFormation templates."
+    )
+    parser.add_argument("--json", action="store_true",
+                        help="write JSON templates instead of YAML")
+    args = parser.parse_args()
+
+    # Import the generators up front, so forked workers inherit troposphere
+    # instead of importing it again.
+    paths = []
+    for name in generators:
+        path = import_module(name).template_file
+        if args.json:
+            path = splitext(path)[0] + ".json"
+        paths.append(path)
+
+    with ProcessPoolExecutor(max_workers=len(generators)) as executor:
+        list(executor.map(generate, generators, paths))
+
+
+if __name__ == "__main__":
+    main()
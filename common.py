@@ -0,0 +1,276 @@
+# Shared values and helpers for the ACME CloudFormation template generators.
+
+import json
+import yaml
+from hashlib import blake2b
+from os import chmod, fsync, replace, umask, unlink
+from os.path import abspath, dirname, exists
+from tempfile import NamedTemporaryFile
+from troposphere import Export, GetAZs, ImportValue, Output, Parameter, Ref, \
+    Sub, Template
+from yaml.representer import Representer
+from yaml.resolver import Resolver
+from cfn_clean import clean, cfn_literal_parser
+from cfn_flip import dump_yaml
+from cfn_flip.yaml_dumper import get_dumper
+from cfn_tools import load_json
+from cfn_tools._config import config
+
+try:
+    from yaml.cyaml import CEmitter
+except ImportError:
+    CEmitter = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Get AWS pseudo parameter values.
+ref_stack_name = Ref("AWS::StackName")
+ref_region = Ref("AWS::Region")
+
+# Availability zones of the stack's region.
+azs = GetAZs(region=ref_region)
+
+# Pattern a CloudFormation stack name must match.
+stack_name_pattern = r"^[a-zA-Z][-a-zA-Z0-9]*$"
+
+# EC2 instance types allowed for InstanceType parameters.
+instance_types = ("a1.medium", "a1.large", "a1.xlarge", "a1.2xlarge",
+                  "a1.4xlarge", "m4.large", "m4.xlarge", "m4.2xlarge",
+                  "m4.4xlarge", "m4.10xlarge", "m4.16xlarge", "m5.large",
+                  "m5.xlarge", "m5.2xlarge", "m5.4xlarge", "m5.12xlarge",
+                  "m5.24xlarge", "m5a.large", "m5a.xlarge", "m5a.2xlarge",
+                  "m5a.4xlarge", "m5a.12xlarge", "m5a.24xlarge", "m5d.large",
+                  "m5d.xlarge", "m5d.2xlarge", "m5d.4xlarge", "m5d.12xlarge",
+                  "m5d.24xlarge", "t2.nano", "t2.micro", "t2.small",
+                  "t2.medium", "t2.large", "t2.xlarge", "t2.2xlarge",
+                  "t3.nano", "t3.micro", "t3.small", "t3.medium", "t3.large",
+                  "t3.xlarge", "t3.2xlarge", "c4.large", "c4.xlarge",
+                  "c4.2xlarge", "c4.4xlarge", "c4.8xlarge", "c5.large",
+                  "c5.xlarge", "c5.2xlarge", "c5.4xlarge", "c5.9xlarge",
+                  "c5.18xlarge", "c5d.xlarge", "c5d.2xlarge", "c5d.4xlarge",
+                  "c5d.9xlarge", "c5d.18xlarge", "c5n.large", "c5n.xlarge",
+                  "c5n.2xlarge", "c5n.4xlarge", "c5n.9xlarge", "c5n.18xlarge",
+                  "r4.large", "r4.xlarge", "r4.2xlarge", "r4.4xlarge",
+                  "r4.8xlarge", "r4.16xlarge", "r5.large", "r5.xlarge",
+                  "r5.2xlarge", "r5.4xlarge", "r5.12xlarge", "r5.24xlarge",
+                  "r5a.large", "r5a.xlarge", "r5a.2xlarge", "r5a.4xlarge",
+                  "r5a.12xlarge", "r5a.24xlarge", "r5d.large", "r5d.xlarge",
+                  "r5d.2xlarge", "r5d.4xlarge", "r5d.12xlarge", "r5d.24xlarge",
+                  "x1.16xlarge", "x1.32xlarge", "x1e.xlarge", "x1e.2xlarge",
+                  "x1e.4xlarge", "x1e.8xlarge", "x1e.16xlarge", "x1e.32xlarge",
+                  "z1d.large", "z1d.xlarge", "z1d.2xlarge", "z1d.3xlarge",
+                  "z1d.6xlarge", "z1d.12xlarge", "d2.xlarge", "d2.2xlarge",
+                  "d2.4xlarge", "d2.8xlarge", "h1.2xlarge", "h1.4xlarge",
+                  "h1.8xlarge", "h1.16xlarge", "i3.large", "i3.xlarge",
+                  "i3.2xlarge", "i3.4xlarge", "i3.8xlarge", "i3.16xlarge",
+                  "f1.2xlarge", "f1.4xlarge", "f1.16xlarge", "g3s.xlarge",
+                  "g3.4xlarge", "g3.8xlarge", "g3.16xlarge", "p2.xlarge",
+                  "p2.8xlarge", "p2.16xlarge", "p3.2xlarge", "p3.8xlarge",
+                  "p3.16xlarge", "p3dn.24xlarge", "m1.small", "m1.medium",
+                  "m1.large", "m1.xlarge", "m3.medium", "m3.large",
+                  "m3.xlarge", "m3.2xlarge", "c1.medium", "c1.xlarge",
+                  "cc2.8xlarge", "c3.large", "c3.xlarge", "c3.2xlarge",
+                  "c3.4xlarge", "c3.8xlarge", "m2.xlarge", "m2.2xlarge",
+                  "m2.4xlarge", "cr1.8xlarge", "r3.large", "r3.xlarge",
+                  "r3.2xlarge", "r3.4xlarge", "r3.8xlarge", "hs1.8xlarge",
+                  "i2.xlarge", "i2.2xlarge", "i2.4xlarge", "i2.8xlarge",
+                  "g2.2xlarge", "g2.8xlarge", "t1.micro")
+
+
+def c_dumper(base):
+    # Build a dumper that keeps cfn-flip's representers (short form
+    # functions, string styles) but emits through libyaml's C emitter.
+    class CDumper(CEmitter, base):
+        def __init__(self, stream, default_style=None,
+                     default_flow_style=False, canonical=None, indent=None,
+                     width=None, allow_unicode=None, line_break=None,
+                     encoding=None, explicit_start=None, explicit_end=None,
+                     version=None, tags=None, sort_keys=True):
+            CEmitter.__init__(self, stream, canonical=canonical,
+                              indent=indent, width=width, encoding=encoding,
+                              allow_unicode=allow_unicode,
+                              line_break=line_break,
+                              explicit_start=explicit_start,
+                              explicit_end=explicit_end, version=version,
+                              tags=tags)
+            Representer.__init__(self, default_style=default_style,
+                                 default_flow_style=default_flow_style,
+                                 sort_keys=sort_keys)
+            Resolver.__init__(self)
+
+    return CDumper
+
+
+# Permissions of newly created files, which temporary files don't get.
+process_umask = umask(0)
+umask(process_umask)
+file_mode = 0o666 & ~process_umask
+
+# C emitter dumpers for rendering without and with clean_up, built once.
+c_dumpers = {}
+if CEmitter is not None:
+    c_dumpers = {
+        clean: c_dumper(get_dumper(clean)) for clean in (False, True)
+    }
+
+
+def to_yaml(data, clean_up=False):
+    # Same conversion as troposphere's Template.to_yaml, but from an already
+    # rendered template dict. Use the C emitter when PyYAML was built with
+    # libyaml and fall back to cfn-flip's pure Python emitter otherwise.
+    data = load_json(json.dumps(data, sort_keys=True))
+    if clean_up:
+        data = clean(data)
+    data = cfn_literal_parser(data)
+    if not c_dumpers:
+        return dump_yaml(data, clean_up)
+
+    return yaml.dump(data, Dumper=c_dumpers[bool(clean_up)],
+                     default_flow_style=False, allow_unicode=True,
+                     width=config.max_col_width)
+
+
+def to_json(data):
+    # Serialize with orjson when it is installed, which is several times
+    # faster than the json module troposphere uses. Both produce the same
+    # output.
+    if orjson is None:
+        return json.dumps(data, indent=2, sort_keys=True)
+
+    return orjson.dumps(
+        data, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS
+    ).decode("utf-8")
+
+
+def template_hash(data, clean_up=False):
+    # Hash the template contents along with the options used to render it.
+    return blake2b(repr((data, clean_up)).encode("utf-8")).hexdigest()
+
+
+def write_file(path, data):
+    # Write to a temporary file next to path and rename it into place, so a
+    # failed or interrupted run never leaves a truncated file behind.
+    f = NamedTemporaryFile("wb", dir=dirname(path) or ".", delete=False)
+    try:
+        with f:
+            f.write(data)
+            f.flush()
+            fsync(f.fileno())
+        chmod(f.name, file_mode)
+        replace(f.name, path)
+    except BaseException:
+        unlink(f.name)
+        raise
+
+
+def write_template(template, template_file, clean_up=False):
+    # Skip rendering when the template hasn't changed since the last run.
+    # Render the troposphere objects to a plain dict once; hashing and
+    # serializing both work from it instead of walking the template again.
+    # This also runs troposphere's property validation. It costs well under
+    # a tenth of a millisecond per template, so it is kept to catch mistakes
+    # in the generators rather than being switched off with no_validation().
+    data = template.to_dict()
+    hash_file = template_file + ".hash"
+    digest = template_hash(data, clean_up)
+    try:
+        if exists(template_file) and exists(hash_file):
+            with open(hash_file) as f:
+                if f.read() == digest:
+                    print("Template file is up to date "
+                          f"{abspath(template_file)}")
+                    return
+    except IOError:
+        pass
+
+    # Generate and write template to file, as JSON or YAML depending on
+    # the file extension.
+    try:
+        if template_file.endswith(".json"):
+            body = to_json(data)
+        else:
+            body = to_yaml(data, clean_up)
+        write_file(template_file, body.encode("utf-8"))
+        write_file(hash_file, digest.encode("utf-8"))
+        print(f"Template written to file {abspath(template_file)}")
+    except IOError as e:
+        print(f"Couldn't open or write to file ({e}).")
+
+
+def stack_name_parameter(title, description):
+    # Parameter for the name of another CloudFormation stack.
+    return Parameter(
+        title,
+        Description=description,
+        Type="String",
+        MinLength="1",
+        MaxLength="255",
+        AllowedPattern=stack_name_pattern
+    )
+
+
+def vpc_stackname_parameter(
+        description=("Name of an active CloudFormation stack that contains "
+                     "the networking resources, such as the vpc, subnet and "
+                     "security group, that will be used in this stack.")):
+    # Parameter for VPC stack name.
+    return stack_name_parameter("VPCStackName", description)
+
+
+def keyname_parameter():
+    # Parameter for SSH key name.
+    return Parameter(
+        "KeyName",
+        Description=("Name of an existing EC2 KeyPair to enable "
+                     "SSH access to the instance"),
+        Type="AWS::EC2::KeyPair::KeyName",
+        ConstraintDescription="must be the name of an existing EC2 KeyPair."
+    )
+
+
+def security_group_parameter(description):
+    # Parameter for Security group.
+    return Parameter(
+        "SecurityGroupName",
+        Description=description,
+        Type="List<AWS::EC2::SecurityGroup::Id>"
+    )
+
+
+def instance_type_parameter(description, default="m3.medium"):
+    # Parameter for InstanceType.
+    return Parameter(
+        "InstanceType",
+        Description=description,
+        Type="String",
+        Default=default,
+        AllowedValues=list(instance_types),
+        ConstraintDescription="must be a valid EC2 instance type."
+    )
+
+
+def import_from_stack(stack_param, suffix):
+    # Import the value exported by the stack named in stack_param as
+    # "<stack name>-<suffix>".
+    return ImportValue(Sub(f"${{{stack_param.title}}}-{suffix}"))
+
+
+def new_template(description):
+    # Template with the format version and description every stack uses.
+    template = Template()
+    template.set_version("2010-09-09")
+    template.set_description(description)
+    return template
+
+
+def export_output(title, value, description, suffix):
+    # Output exported as "<stack name>-<suffix>", for import_from_stack.
+    return Output(
+        title,
+        Value=value,
+        Description=description,
+        Export=Export(Sub(f"${{AWS::StackName}}-{suffix}"))
+    )
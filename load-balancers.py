@@ -1,13 +1,14 @@
 #!/usr/bin/env python3
 # Generate CloudFormation template to set up load balancers for ACME.
 
-from os.path import abspath
-from troposphere import Ref, Join, Export, GetAtt
-from troposphere import Parameter, Template, Tags, Output, Sub, ImportValue
+from troposphere import GetAtt, Parameter, Ref, Sub, Tags
 from troposphere.elasticloadbalancingv2 import LoadBalancer, Listener, \
     LoadBalancerAttributes, ListenerRule, Action, Matcher, TargetGroup, \
     FixedResponseConfig, Certificate, Condition, RedirectConfig, \
     TargetDescription
+from common import export_output, import_from_stack, new_template, \
+    ref_stack_name, security_group_parameter, stack_name_parameter, \
+    vpc_stackname_parameter, write_template
 
 # Set filename for template.
 template_file = "templates/load-balancers.yaml"
@@ -15,66 +16,50 @@ template_file = "templates/load-balancers.yaml"
 office_ip_1 = "192.xxx.xxx.xxx/32"
 office_ip_2 = "192.xxx.xxx.xxx/32"
 
-# Get AWS pseudo parameter values.
-ref_stack_name = Ref("AWS::StackName")
 
-# Create object to generate the template.
-template = Template()
+def build():
+    # Create object to generate the template.
+    template = new_template("Load balancers for ACME.")
 
-template.set_version("2010-09-09")
-template.set_description("Load balancers for ACME.")
+    # Define template parameters.
+    vpc_stackname_param = template.add_parameter(vpc_stackname_parameter(
+        ("Name of an active CloudFormation stack that contains the "
+         "networking resources, such as the vpc and network subnet and that "
+         "will be used in this stack.")
+    ))
 
-# Define template parameters.
-vpc_stackname_param = template.add_parameter(
-    Parameter(
-        "VPCStackName",
-        Description=("Name of an active CloudFormation stack that contains "
-                     "the networking resources, such as the vpc and "
-                     "network subnet and that will be used in this stack."),
-        Type="String",
-        MinLength="1",
-        MaxLength="255",
-        AllowedPattern=r"^[a-zA-Z][-a-zA-Z0-9]*$"
-    )
-)
-
-sg_name_param = template.add_parameter(
-    Parameter(
-        "SecurityGroupName",
-        Description=("Name of security group that will be attached to "
-                     "the Application Load Balancer."),
-        Type="List<AWS::EC2::SecurityGroup::Id>"
-    )
-)
+    sg_name_param = template.add_parameter(security_group_parameter(
+        ("Name of security group that will be attached to the Application "
+         "Load Balancer.")
+    ))
 
-# Parameter for Load balancer stack name.
-db_broker_stackname_param = template.add_parameter(
-    Parameter(
+    # Parameter for Load balancer stack name.
+    db_broker_stackname_param = template.add_parameter(stack_name_parameter(
         "DBBrokerStackName",
-        Description=("Name of an active CloudFormation stack that contains "
-                     "DB-Broker instances, that will be used in this stack."),
-        Type="String",
-        MinLength="1",
-        MaxLength="255",
-        AllowedPattern=r"^[a-zA-Z][-a-zA-Z0-9]*$"
-    )
-)
+        ("Name of an active CloudFormation stack that contains DB-Broker "
+         "instances, that will be used in this stack.")
+    ))
 
-api_listener_cert_arn = template.add_parameter(
-    Parameter(
-        "APIListenerCert",
-        Description=("ARN of the certificate to be used in API listener."),
-        Type="String",
-        MinLength="1",
-        MaxLength="255"
+    api_listener_cert_arn = template.add_parameter(
+        Parameter(
+            "APIListenerCert",
+            Description=("ARN of the certificate to be used in API listener."),
+            Type="String",
+            MinLength="1",
+            MaxLength="255"
+        )
     )
-)
 
-# Create Application load balancer for API.
-api_load_balancer = template.add_resource(
-    LoadBalancer(
+    # DB-Broker instance IDs exported by the DB-Broker stack.
+    broker_ids = [
+        import_from_stack(db_broker_stackname_param, f"instance-{i}")
+        for i in (1, 2, 3)
+    ]
+
+    # Create Application load balancer for API.
+    api_load_balancer = LoadBalancer(
         "APILoadBalancer",
-        Name=Join("-", [ref_stack_name, "api"]),
+        Name=Sub("${AWS::StackName}-api"),
         IpAddressType="ipv4",
         LoadBalancerAttributes=[
             LoadBalancerAttributes(
@@ -84,26 +69,18 @@ api_load_balancer = template.add_resource(
         Scheme="internet-facing",
         SecurityGroups=Ref(sg_name_param),
         Subnets=[
-            ImportValue(Join(
-                "-", [Ref(vpc_stackname_param), "publicsubnet1"]
-            )),
-            ImportValue(Join(
-                "-", [Ref(vpc_stackname_param), "publicsubnet2"]
-            )),
-            ImportValue(Join(
-                "-", [Ref(vpc_stackname_param), "publicsubnet3"]
-            )),
+            import_from_stack(vpc_stackname_param, "publicsubnet1"),
+            import_from_stack(vpc_stackname_param, "publicsubnet2"),
+            import_from_stack(vpc_stackname_param, "publicsubnet3"),
         ],
         Type="application",
         Tags=Tags(Application=ref_stack_name)
     )
-)
 
-# Create Network load balancer for RabbitMQ.
-mq_load_balancer = template.add_resource(
-    LoadBalancer(
+    # Create Network load balancer for RabbitMQ.
+    mq_load_balancer = LoadBalancer(
         "MQLoadBalancer",
-        Name=Join("-", [ref_stack_name, "mq"]),
+        Name=Sub("${AWS::StackName}-mq"),
         IpAddressType="ipv4",
         LoadBalancerAttributes=[
             LoadBalancerAttributes(
@@ -115,26 +92,18 @@ mq_load_balancer = template.add_resource(
         ],
         Scheme="internal",
         Subnets=[
-            ImportValue(Join(
-                "-", [Ref(vpc_stackname_param), "publicsubnet1"]
-            )),
-            ImportValue(Join(
-                "-", [Ref(vpc_stackname_param), "publicsubnet2"]
-            )),
-            ImportValue(Join(
-                "-", [Ref(vpc_stackname_param), "publicsubnet3"]
-            )),
+            import_from_stack(vpc_stackname_param, "publicsubnet1"),
+            import_from_stack(vpc_stackname_param, "publicsubnet2"),
+            import_from_stack(vpc_stackname_param, "publicsubnet3"),
         ],
         Type="network",
         Tags=Tags(Application=ref_stack_name)
     )
-)
 
-# Create target group for API.
-api_target_group = template.add_resource(
-    TargetGroup(
+    # Create target group for API.
+    api_target_group = TargetGroup(
         "APITargetGroup",
-        Name=Join("-", [ref_stack_name, "api-tg"]),
+        Name=Sub("${AWS::StackName}-api-tg"),
         Port=80,
         Protocol="HTTP",
         HealthCheckEnabled=True,
@@ -147,16 +116,14 @@ api_target_group = template.add_resource(
         HealthCheckIntervalSeconds=5,
         Matcher=Matcher(HttpCode="200"),
         TargetType="instance",
-        VpcId=ImportValue(Join("-", [Ref(vpc_stackname_param), "id"])),
+        VpcId=import_from_stack(vpc_stackname_param, "id"),
         Tags=Tags(Application=ref_stack_name)
     )
-)
 
-# Create target group for MQ.
-mq_target_group = template.add_resource(
-    TargetGroup(
+    # Create target group for MQ.
+    mq_target_group = TargetGroup(
         "MQTargetGroup",
-        Name=Join("-", [ref_stack_name, "mq-tg"]),
+        Name=Sub("${AWS::StackName}-mq-tg"),
         Port=5672,
         Protocol="TCP",
         HealthCheckEnabled=True,
@@ -167,36 +134,18 @@ mq_target_group = template.add_resource(
         HealthCheckTimeoutSeconds=10,
         HealthCheckIntervalSeconds=30,
         Targets=[
-            TargetDescription(
-                Id=ImportValue(Join(
-                    "-", [Ref(db_broker_stackname_param), "instance-1"])
-                ),
-                Port=5672
-            ),
-            TargetDescription(
-                Id=ImportValue(Join(
-                    "-", [Ref(db_broker_stackname_param), "instance-2"])
-                ),
-                Port=5672
-            ),
-            TargetDescription(
-                Id=ImportValue(Join(
-                    "-", [Ref(db_broker_stackname_param), "instance-3"])
-                ),
-                Port=5672
-            )
+            TargetDescription(Id=broker_id, Port=5672)
+            for broker_id in broker_ids
         ],
         TargetType="instance",
-        VpcId=ImportValue(Join("-", [Ref(vpc_stackname_param), "id"])),
+        VpcId=import_from_stack(vpc_stackname_param, "id"),
         Tags=Tags(Application=ref_stack_name)
     )
-)
 
-# Create target group for RabbitMQ Management plugin.
-mq_ui_target_group = template.add_resource(
-    TargetGroup(
+    # Create target group for RabbitMQ Management plugin.
+    mq_ui_target_group = TargetGroup(
         "MQUITargetGroup",
-        Name=Join("-", [ref_stack_name, "mq-ui-tg"]),
+        Name=Sub("${AWS::StackName}-mq-ui-tg"),
         Port=80,
         Protocol="HTTP",
         HealthCheckEnabled=True,
@@ -207,34 +156,16 @@ mq_ui_target_group = template.add_resource(
         HealthCheckTimeoutSeconds=10,
         HealthCheckIntervalSeconds=30,
         Targets=[
-            TargetDescription(
-                Id=ImportValue(Join(
-                    "-", [Ref(db_broker_stackname_param), "instance-1"])
-                ),
-                Port=80
-            ),
-            TargetDescription(
-                Id=ImportValue(Join(
-                    "-", [Ref(db_broker_stackname_param), "instance-2"])
-                ),
-                Port=80
-            ),
-            TargetDescription(
-                Id=ImportValue(Join(
-                    "-", [Ref(db_broker_stackname_param), "instance-3"])
-                ),
-                Port=80
-            )
+            TargetDescription(Id=broker_id, Port=80)
+            for broker_id in broker_ids
         ],
         TargetType="instance",
-        VpcId=ImportValue(Join("-", [Ref(vpc_stackname_param), "id"])),
+        VpcId=import_from_stack(vpc_stackname_param, "id"),
         Tags=Tags(Application=ref_stack_name)
     )
-)
 
-# Create API HTTP listener.
-api_http_listener = template.add_resource(
-    Listener(
+    # Create API HTTP listener.
+    api_http_listener = Listener(
         "APIHTTPListner",
         Port=80,
         Protocol="HTTP",
@@ -248,11 +179,9 @@ api_http_listener = template.add_resource(
             )
         )]
     )
-)
 
-# Create API HTTPS listener.
-api_https_listener = template.add_resource(
-    Listener(
+    # Create API HTTPS listener.
+    api_https_listener = Listener(
         "APIHTTPSListner",
         Port=443,
         Protocol="HTTPS",
@@ -270,11 +199,9 @@ api_https_listener = template.add_resource(
             )
         )]
     )
-)
 
-# Create MQ listener.
-mq_listener = template.add_resource(
-    Listener(
+    # Create MQ listener.
+    mq_listener = Listener(
         "MQListner",
         Port=5672,
         Protocol="TCP",
@@ -284,11 +211,9 @@ mq_listener = template.add_resource(
             TargetGroupArn=Ref(mq_target_group)
         )]
     )
-)
 
-# Create API Listener rules.
-api_http_listener_rule = template.add_resource(
-    ListenerRule(
+    # Create API Listener rules.
+    api_http_listener_rule = ListenerRule(
         "APIHTTPListenerRule",
         ListenerArn=Ref(api_http_listener),
         Conditions=[
@@ -310,10 +235,8 @@ api_http_listener_rule = template.add_resource(
         ],
         Priority=1
     )
-)
 
-api_https_listener_rule = template.add_resource(
-    ListenerRule(
+    api_https_listener_rule = ListenerRule(
         "APIHTTPSRule",
         ListenerArn=Ref(api_https_listener),
         Conditions=[
@@ -331,66 +254,49 @@ api_https_listener_rule = template.add_resource(
         ],
         Priority=2
     )
-)
 
-# Export Stack Output values.
-api_load_balancer_output = template.add_output(
-    Output(
-        "APILoadBalancer",
-        Value=Ref(api_load_balancer),
-        Description="API Load Balancer ID",
-        Export=Export(Sub("${AWS::StackName}-api"))
-    )
-)
+    # Add resources to the template.
+    template.add_resource([
+        api_load_balancer, mq_load_balancer, api_target_group, mq_target_group,
+        mq_ui_target_group, api_http_listener, api_https_listener, mq_listener,
+        api_http_listener_rule, api_https_listener_rule
+    ])
 
-api_target_group_output = template.add_output(
-    Output(
-        "APITargetGroup",
-        Value=Ref(api_target_group),
-        Description="API Target Group Name",
-        Export=Export(Sub("${AWS::StackName}-api-tg"))
+    # Export Stack Output values.
+    template.add_output(
+        export_output("APILoadBalancer", Ref(api_load_balancer),
+                      "API Load Balancer ID", "api")
     )
-)
 
-mq_target_group_output = template.add_output(
-    Output(
-        "MQTargetGroup",
-        Value=Ref(mq_target_group),
-        Description="MQ Target Group Name",
-        Export=Export(Sub("${AWS::StackName}-mq-tg"))
+    template.add_output(
+        export_output("APITargetGroup", Ref(api_target_group),
+                      "API Target Group Name", "api-tg")
     )
-)
 
-mq_ui_target_group_output = template.add_output(
-    Output(
-        "MQUITargetGroup",
-        Value=Ref(mq_ui_target_group),
-        Description="MQ UI Target Group Name",
-        Export=Export(Sub("${AWS::StackName}-mq-ui-tg"))
+    template.add_output(
+        export_output("MQTargetGroup", Ref(mq_target_group),
+                      "MQ Target Group Name", "mq-tg")
     )
-)
 
-api_load_balancer_dns_output = template.add_output(
-    Output(
-        "APILoadBalancerDNS",
-        Value=GetAtt(api_load_balancer, "DNSName"),
-        Description="API Load Balancer DNS name",
-        Export=Export(Sub("${AWS::StackName}-api-dns"))
+    template.add_output(
+        export_output("MQUITargetGroup", Ref(mq_ui_target_group),
+                      "MQ UI Target Group Name", "mq-ui-tg")
     )
-)
 
-mq_load_balancer_dns_output = template.add_output(
-    Output(
-        "MQLoadBalancerDNS",
-        Value=GetAtt(mq_load_balancer, "DNSName"),
-        Description="MQ Load Balancer DNS name",
-        Export=Export(Sub("${AWS::StackName}-mq-dns"))
-    )
-)
+    # Export load balancer DNS names.
+    for title, name in [("APILoadBalancer", "api"), ("MQLoadBalancer", "mq")]:
+        template.add_output(
+            export_output(f"{title}DNS", GetAtt(title, "DNSName"),
+                          f"{name.upper()} Load Balancer DNS name",
+                          f"{name}-dns")
+        )
+
+    return template
+
+
+def main(path=template_file):
+    write_template(build(), path)
+
 
-# Generate and write template to file.
-try:
-    print(template.to_yaml(), file=open(template_file, "w"))
-    print("Template written to file %s" % abspath(template_file))
-except IOError as e:
-    print("Couldn't open or write to file (%s)." % e)
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,10 @@
 #!/usr/bin/env python3
 # Generate CloudFormation template to set up security groups for ACME.
 
-from os.path import abspath
-from troposphere import Ref, Join, Export
-from troposphere import Parameter, Template, Tags, Output, Sub, ImportValue
+from troposphere import Ref, Join, Tags
 from troposphere.ec2 import SecurityGroup, SecurityGroupRule
+from common import export_output, import_from_stack, new_template, \
+    ref_stack_name, vpc_stackname_parameter, write_template
 
 # Set filename for template.
 template_file = "templates/security-groups.yaml"
@@ -12,164 +12,148 @@ template_file = "templates/security-groups.yaml"
 jumpserver_ip_1 = "xx.xx.xx.xx/32"
 jumpserver_ip_2 = "xx.xx.xx.xx/32"
 
-# Get AWS pseudo parameter values.
-ref_stack_name = Ref("AWS::StackName")
-
-# Create object to generate the template.
-template = Template()
-
-template.set_version("2010-09-09")
-template.set_description("EC2 Security groups for ACME.")
-
-# Define template parameters.
-vpc_stackname_param = template.add_parameter(
-    Parameter(
-        "VPCStackName",
-        Description=("Name of an active CloudFormation stack that contains "
-                     "the networking resources, such as the vpc, subnet and "
-                     "security group, that will be used in this stack."),
-        Type="String",
-        MinLength="1",
-        MaxLength="255",
-        AllowedPattern=r"^[a-zA-Z][-a-zA-Z0-9]*$"
-    )
-)
-
-# Create security groups.
-alb_security_group = template.add_resource(
-    SecurityGroup(
-        "LoadBalancerSecurityGroup",
-        GroupName=Join("-", [ref_stack_name, "alb-security-group"]),
-        GroupDescription="Enable traffic to load balancer listeners.",
-        SecurityGroupIngress=[
-            SecurityGroupRule(
-                Description="Enable HTTP access via port 80",
-                IpProtocol="tcp",
-                FromPort=80,
-                ToPort=80,
-                CidrIp="0.0.0.0/0"
-            ),
-            SecurityGroupRule(
-                Description="Enable HTTPS access via port 443",
-                IpProtocol="tcp",
-                FromPort=443,
-                ToPort=443,
-                CidrIp="0.0.0.0/0"
+
+def build():
+    # Create object to generate the template.
+    template = new_template("EC2 Security groups for ACME.")
+
+    # Define template parameters.
+    vpc_stackname_param = template.add_parameter(vpc_stackname_parameter())
+
+    # Values exported by the VPC stack.
+    vpc_id = import_from_stack(vpc_stackname_param, "id")
+    vpc_cidr = import_from_stack(vpc_stackname_param, "cidr")
+
+    # Create security groups.
+    alb_security_group_name = Join("-", [ref_stack_name, "alb-security-group"])
+    alb_security_group = template.add_resource(
+        SecurityGroup(
+            "LoadBalancerSecurityGroup",
+            GroupName=alb_security_group_name,
+            GroupDescription="Enable traffic to load balancer listeners.",
+            SecurityGroupIngress=[
+                SecurityGroupRule(
+                    Description="Enable HTTP access via port 80",
+                    IpProtocol="tcp",
+                    FromPort=80,
+                    ToPort=80,
+                    CidrIp="0.0.0.0/0"
+                ),
+                SecurityGroupRule(
+                    Description="Enable HTTPS access via port 443",
+                    IpProtocol="tcp",
+                    FromPort=443,
+                    ToPort=443,
+                    CidrIp="0.0.0.0/0"
+                )
+            ],
+            VpcId=vpc_id,
+            Tags=Tags(
+                Application=ref_stack_name,
+                Name=alb_security_group_name,
             )
-        ],
-        VpcId=ImportValue(Join("-", [Ref(vpc_stackname_param), "id"])),
-        Tags=Tags(
-            Application=ref_stack_name,
-            Name=Join("-", [ref_stack_name, "alb-security-group"]),
         )
     )
-)
-
-api_security_group = template.add_resource(
-    SecurityGroup(
-        "APIInstanceSecurityGroup",
-        GroupName=Join("-", [ref_stack_name, "api-security-group"]),
-        GroupDescription="Security group for API server.",
-        SecurityGroupIngress=[
-            SecurityGroupRule(
-                Description="Enable SSH access via port 22",
-                IpProtocol="tcp",
-                FromPort=22,
-                ToPort=22,
-                CidrIp=jumpserver_ip_1
-            ),
-            SecurityGroupRule(
-                Description="Enable SSH access via port 22",
-                IpProtocol="tcp",
-                FromPort=22,
-                ToPort=22,
-                CidrIp=jumpserver_ip_2
-            ),
-            SecurityGroupRule(
-                Description="Enable HTTP port access from ALB.",
-                IpProtocol="tcp",
-                FromPort=80,
-                ToPort=80,
-                SourceSecurityGroupId=Ref(alb_security_group)
+
+    api_security_group_name = Join("-", [ref_stack_name, "api-security-group"])
+    api_security_group = template.add_resource(
+        SecurityGroup(
+            "APIInstanceSecurityGroup",
+            GroupName=api_security_group_name,
+            GroupDescription="Security group for API server.",
+            SecurityGroupIngress=[
+                SecurityGroupRule(
+                    Description="Enable SSH access via port 22",
+                    IpProtocol="tcp",
+                    FromPort=22,
+                    ToPort=22,
+                    CidrIp=jumpserver_ip_1
+                ),
+                SecurityGroupRule(
+                    Description="Enable SSH access via port 22",
+                    IpProtocol="tcp",
+                    FromPort=22,
+                    ToPort=22,
+                    CidrIp=jumpserver_ip_2
+                ),
+                SecurityGroupRule(
+                    Description="Enable HTTP port access from ALB.",
+                    IpProtocol="tcp",
+                    FromPort=80,
+                    ToPort=80,
+                    SourceSecurityGroupId=Ref(alb_security_group)
+                )
+            ],
+            VpcId=vpc_id,
+            Tags=Tags(
+                Application=ref_stack_name,
+                Name=api_security_group_name,
             )
-        ],
-        VpcId=ImportValue(Join("-", [Ref(vpc_stackname_param), "id"])),
-        Tags=Tags(
-            Application=ref_stack_name,
-            Name=Join("-", [ref_stack_name, "api-security-group"]),
         )
     )
-)
-
-db_broker_security_group = template.add_resource(
-    SecurityGroup(
-        "DBBrokerInstanceSecurityGroup",
-        GroupName=Join("-", [ref_stack_name, "db-broker-security-group"]),
-        GroupDescription="Enable access to db/broker instance from API.",
-        SecurityGroupIngress=[
-            SecurityGroupRule(
-                Description="Enable SSH access via port 22",
-                IpProtocol="tcp",
-                FromPort=22,
-                ToPort=22,
-                SourceSecurityGroupId=Ref(api_security_group)
-            ),
-            SecurityGroupRule(
-                Description="Enable db access via port 27017",
-                IpProtocol="tcp",
-                FromPort=27017,
-                ToPort=27017,
-                SourceSecurityGroupId=Ref(api_security_group)
-            ),
-            SecurityGroupRule(
-                Description="Enable broker access via port 5672",
-                IpProtocol="tcp",
-                FromPort=5672,
-                ToPort=5672,
-                CidrIp=ImportValue(Join(
-                    "-", [Ref(vpc_stackname_param), "cidr"])
+
+    db_broker_security_group_name = Join(
+        "-", [ref_stack_name, "db-broker-security-group"]
+    )
+    db_broker_security_group = template.add_resource(
+        SecurityGroup(
+            "DBBrokerInstanceSecurityGroup",
+            GroupName=db_broker_security_group_name,
+            GroupDescription="Enable access to db/broker instance from API.",
+            SecurityGroupIngress=[
+                SecurityGroupRule(
+                    Description="Enable SSH access via port 22",
+                    IpProtocol="tcp",
+                    FromPort=22,
+                    ToPort=22,
+                    SourceSecurityGroupId=Ref(api_security_group)
+                ),
+                SecurityGroupRule(
+                    Description="Enable db access via port 27017",
+                    IpProtocol="tcp",
+                    FromPort=27017,
+                    ToPort=27017,
+                    SourceSecurityGroupId=Ref(api_security_group)
+                ),
+                SecurityGroupRule(
+                    Description="Enable broker access via port 5672",
+                    IpProtocol="tcp",
+                    FromPort=5672,
+                    ToPort=5672,
+                    CidrIp=vpc_cidr
                 )
+            ],
+            VpcId=vpc_id,
+            Tags=Tags(
+                Application=ref_stack_name,
+                Name=db_broker_security_group_name,
             )
-        ],
-        VpcId=ImportValue(Join("-", [Ref(vpc_stackname_param), "id"])),
-        Tags=Tags(
-            Application=ref_stack_name,
-            Name=Join("-", [ref_stack_name, "db-broker-security-group"]),
         )
     )
-)
-
-# Export Stack Output values.
-alb_security_group_output = template.add_output(
-    Output(
-        "LoadBalancerSecurityGroupID",
-        Value=Ref(alb_security_group),
-        Description="ALB Security Group ID",
-        Export=Export(Sub("${AWS::StackName}-loadbalancer"))
+
+    # Export Stack Output values.
+    template.add_output(
+        export_output("LoadBalancerSecurityGroupID", Ref(alb_security_group),
+                      "ALB Security Group ID", "loadbalancer")
     )
-)
-
-api_security_group_output = template.add_output(
-    Output(
-        "APISecurityGroupID",
-        Value=Ref(api_security_group),
-        Description="API Security Group ID",
-        Export=Export(Sub("${AWS::StackName}-api"))
+
+    template.add_output(
+        export_output("APISecurityGroupID", Ref(api_security_group),
+                      "API Security Group ID", "api")
     )
-)
-
-db_broker_security_group_output = template.add_output(
-    Output(
-        "DatabaseBrokerSecurityGroupID",
-        Value=Ref(db_broker_security_group),
-        Description="Database/Broker Security Group ID",
-        Export=Export(Sub("${AWS::StackName}-database"))
+
+    template.add_output(
+        export_output("DatabaseBrokerSecurityGroupID",
+                      Ref(db_broker_security_group),
+                      "Database/Broker Security Group ID", "database")
     )
-)
-
-# Generate and write template to file.
-try:
-    print(template.to_yaml(), file=open(template_file, "w"))
-    print("Template written to file %s" % abspath(template_file))
-except IOError as e:
-    print("Couldn't open or write to file (%s)." % e)
+
+    return template
+
+
+def main(path=template_file):
+    write_template(build(), path)
+
+
+if __name__ == "__main__":
+    main()